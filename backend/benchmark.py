@@ -0,0 +1,137 @@
+"""Throughput benchmark for the multi-worker deployment.
+
+Starts gunicorn with an increasing number of workers and measures how many
+/api/analyze-resume requests per second each configuration sustains.
+
+    python benchmark.py --workers 1 2 4 --requests 200 --concurrency 16
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+JOB_DESCRIPTION = (
+    "We are hiring a Software Engineer with strong Python, JavaScript and React experience, "
+    "comfortable with SQL databases, Git, Docker and AWS, who writes clean, tested code."
+)
+
+def build_docx(text: str) -> bytes:
+    """Build a minimal DOCX containing one paragraph per line of text"""
+    paragraphs = "".join(
+        f'<w:p><w:r><w:t xml:space="preserve">{escape(line)}</w:t></w:r></w:p>' for line in text.splitlines()
+    )
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{paragraphs}</w:body></w:document>"
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(
+            "[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            "</Types>",
+        )
+        archive.writestr("word/document.xml", document)
+    return buffer.getvalue()
+
+def multipart_body(fields: dict, file_name: str, file_data: bytes):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{file_name}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n".encode() + file_data + b"\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+def send_request(base_url: str, resume_text: str, index: int) -> bool:
+    # Vary the content so the shared extraction cache doesn't short-circuit the work
+    docx = build_docx(f"{resume_text}\nReference {index} {uuid.uuid4().hex}")
+    body, content_type = multipart_body(
+        {"job_role": "Software Engineer", "job_description": JOB_DESCRIPTION}, "resume.docx", docx
+    )
+    request = urllib.request.Request(
+        f"{base_url}/api/analyze-resume", data=body, headers={"Content-Type": content_type}
+    )
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return json.loads(response.read()).get("status") == "ok"
+
+def wait_until_healthy(base_url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/health", timeout=2):
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError("Server did not become healthy in time")
+
+def run(workers: int, requests: int, concurrency: int, port: int, resume_text: str) -> float:
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(workers),
+        PORT=str(port),
+        GEMINI_API_KEY="",
+        SHARED_CACHE_PATH=os.path.join(tempfile.mkdtemp(), "cache.sqlite3"),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py", "--log-level", "warning"],
+        cwd=HERE, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_healthy(base_url)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            # Warm up every worker (and its extraction processes) before timing
+            list(pool.map(lambda i: send_request(base_url, resume_text, i), range(concurrency)))
+            start = time.perf_counter()
+            results = list(pool.map(lambda i: send_request(base_url, resume_text, i), range(requests)))
+            elapsed = time.perf_counter() - start
+        if not all(results):
+            raise RuntimeError("Some requests failed")
+        return requests / elapsed
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=10100)
+    args = parser.parse_args()
+
+    with open(os.path.join(HERE, "resume.txt"), encoding="utf-8") as f:
+        resume_text = f.read()
+
+    baseline = None
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8} {'efficiency':>10}")
+    for workers in args.workers:
+        throughput = run(workers, args.requests, args.concurrency, args.port, resume_text)
+        baseline = baseline or throughput / workers
+        speedup = throughput / baseline
+        print(f"{workers:>8} {throughput:>10.1f} {speedup:>8.2f} {speedup / workers:>10.0%}")
+
+if __name__ == "__main__":
+    main()
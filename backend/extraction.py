@@ -0,0 +1,508 @@
+"""Text extraction for PDF and DOCX files, run in supervised worker processes.
+
+This module is kept free of the web framework, sklearn and Gemini imports so
+extraction workers start as small interpreters from the forkserver.
+"""
+import os
+import re
+import hashlib
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Callable, Optional, Dict, List
+
+try:
+    import resource
+except ImportError:  # Windows has no rlimits; the sandbox then only enforces deadlines
+    resource = None
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+import pytesseract
+from pdf2image import convert_from_path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Extraction sandbox limits (PyPDF2, poppler and Tesseract run in supervised worker processes)
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+EXTRACTION_TIMEOUT_SECONDS = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "60"))
+EXTRACTION_CPU_SECONDS = int(os.getenv("EXTRACTION_CPU_SECONDS", "45"))
+EXTRACTION_MEMORY_MB = int(os.getenv("EXTRACTION_MEMORY_MB", "1024"))
+EXTRACTION_MAX_PAGES = int(os.getenv("EXTRACTION_MAX_PAGES", "20"))
+EXTRACTION_WORKER_MAX_JOBS = int(os.getenv("EXTRACTION_WORKER_MAX_JOBS", "50"))
+
+class PageLimitExceeded(Exception):
+    """Raised when a PDF has more pages than EXTRACTION_MAX_PAGES"""
+
+PDF_RESOURCE_MAX_DEPTH = 32
+
+def _update_pdf_object_digest(digest, obj, stream_digests: Dict, path: set, depth: int = 0):
+    """Feed a PDF object tree into digest, resolving references (but not cycles)"""
+    if isinstance(obj, IndirectObject):
+        ref = (obj.idnum, obj.generation)
+        if ref in path or depth > PDF_RESOURCE_MAX_DEPTH:
+            digest.update(b"R")
+            return
+        path = path | {ref}
+        target = obj.get_object()
+        if isinstance(target, StreamObject):
+            # Fonts and images are usually shared by every page, so decode each only once
+            if ref not in stream_digests:
+                stream_digest = hashlib.sha256()
+                _update_pdf_object_digest(stream_digest, target, stream_digests, path, depth + 1)
+                stream_digests[ref] = stream_digest.digest()
+            digest.update(stream_digests[ref])
+            return
+        obj = target
+    
+    if isinstance(obj, DictionaryObject):
+        digest.update(b"<<")
+        for key, value in sorted(obj.items()):
+            if key == "/Parent":
+                continue
+            digest.update(key.encode())
+            _update_pdf_object_digest(digest, value, stream_digests, path, depth + 1)
+        digest.update(b">>")
+        if isinstance(obj, StreamObject):
+            try:
+                digest.update(obj.get_data())
+            except Exception:
+                digest.update(repr(obj).encode())
+    elif isinstance(obj, ArrayObject):
+        digest.update(b"[")
+        for value in obj:
+            _update_pdf_object_digest(digest, value, stream_digests, path, depth + 1)
+        digest.update(b"]")
+    else:
+        digest.update(repr(obj).encode())
+
+def _pdf_page_hash(page, stream_digests: Optional[Dict] = None) -> str:
+    """Hash a PDF page's content stream and everything in its resources.
+
+    The resources cover embedded images (scanned pages share content streams)
+    and fonts, whose encoding and ToUnicode maps decide the extracted text.
+    """
+    digest = hashlib.sha256()
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    resources = page.get("/Resources")
+    if resources is not None:
+        _update_pdf_object_digest(digest, resources, {} if stream_digests is None else stream_digests, set())
+    return digest.hexdigest()
+
+def extract_pdf_pages(file_path: str, known_pages: Optional[Dict[str, Dict]] = None) -> List[Dict]:
+    """Extract text page by page with PyPDF2, fallback to OCR.
+
+    Pages whose content hash appears in known_pages (from a previous revision)
+    reuse the stored result instead of being parsed or OCR'd again.
+    """
+    known_pages = known_pages or {}
+    try:
+        reader = PdfReader(file_path)
+        page_count = len(reader.pages)
+        if page_count > EXTRACTION_MAX_PAGES:
+            # Scoring only part of a document would be misleading, so refuse it outright
+            raise PageLimitExceeded(f"PDF has {page_count} pages; at most {EXTRACTION_MAX_PAGES} are supported.")
+        pages = []
+        stream_digests = {}
+        for page_index in range(page_count):
+            page = reader.pages[page_index]
+            page_hash = _pdf_page_hash(page, stream_digests)
+            if page_hash in known_pages:
+                pages.append({**known_pages[page_hash], "hash": page_hash, "reused": True})
+            else:
+                pages.append({"hash": page_hash, "text": page.extract_text() or "", "ocr": False, "reused": False})
+        
+        # If no text extracted, use OCR
+        if not any(page["text"].strip() for page in pages if not page["ocr"]):
+            logging.info("Falling back to OCR for PDF text extraction.")
+            try:
+                # Render each contiguous run of changed pages with a single pdftoppm call
+                page_index = 0
+                while page_index < len(pages):
+                    if pages[page_index]["reused"]:
+                        page_index += 1
+                        continue
+                    run_end = page_index
+                    while run_end + 1 < len(pages) and not pages[run_end + 1]["reused"]:
+                        run_end += 1
+                    images = convert_from_path(file_path, first_page=page_index + 1, last_page=run_end + 1)
+                    for page, image in zip(pages[page_index:run_end + 1], images):
+                        page["text"] = pytesseract.image_to_string(image) + "\n"
+                        page["ocr"] = True
+                    page_index = run_end + 1
+            except MemoryError:
+                raise
+            except Exception as ocr_error:
+                logging.error(f"OCR fallback failed: {ocr_error}")
+        
+        return pages
+    except (MemoryError, PageLimitExceeded):
+        # Let the sandbox report these instead of an empty result
+        raise
+    except Exception as e:
+        logging.error(f"PDF extraction error: {e}")
+        return []
+
+def join_pdf_pages(pages: List[Dict]) -> str:
+    """Join per-page results into the document text"""
+    return "".join(page["text"] + "\n" for page in pages if page["text"]).strip()
+
+def extract_text_from_pdf(file_path: str) -> str:
+    """Extract text from PDF using PyPDF2, fallback to OCR"""
+    return join_pdf_pages(extract_pdf_pages(file_path))
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+# Run content that maps to fixed characters (w:t carries its own text)
+RUN_CHARACTERS = {
+    W_NS + "tab": "\t",
+    W_NS + "br": "\n",
+    W_NS + "cr": "\n",
+    W_NS + "noBreakHyphen": "-",
+}
+
+def _docx_part_order(name: str):
+    """Sort header2.xml after header1.xml and before header10.xml"""
+    digits = re.search(r'(\d+)\.xml$', name)
+    return (int(digits.group(1)) if digits else 0, name)
+
+def _iter_docx_part_lines(xml_file):
+    """Stream one WordprocessingML part, yielding lines of text in reading order.
+
+    Paragraphs become lines, table rows become tab-separated cells, and text
+    boxes are read from their DrawingML content (the VML fallback copy is skipped).
+    """
+    paragraphs = []  # text buffers of open paragraphs (text boxes nest them)
+    cells = []       # line buffers of open table cells
+    rows = []        # cell lists of open table rows
+    fallback_depth = 0
+    run_depth = 0         # text only counts inside w:r ...
+    properties_depth = 0  # ... and not in w:pPr (whose w:tabs/w:tab are tab stops)
+    
+    for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+        tag = elem.tag
+        if tag == MC_FALLBACK:
+            fallback_depth += 1 if event == "start" else -1
+            if event == "end":
+                elem.clear()
+            continue
+        if fallback_depth:
+            continue
+        
+        if tag == W_NS + "r":
+            run_depth += 1 if event == "start" else -1
+            continue
+        if tag == W_NS + "pPr":
+            properties_depth += 1 if event == "start" else -1
+            continue
+        
+        if event == "start":
+            if tag == W_NS + "p":
+                paragraphs.append([])
+            elif tag == W_NS + "tc":
+                cells.append([])
+            elif tag == W_NS + "tr":
+                rows.append([])
+            continue
+        
+        in_run_text = paragraphs and run_depth and not properties_depth
+        if tag == W_NS + "t":
+            if in_run_text and elem.text:
+                paragraphs[-1].append(elem.text)
+        elif tag in RUN_CHARACTERS:
+            if in_run_text:
+                paragraphs[-1].append(RUN_CHARACTERS[tag])
+        elif tag == W_NS + "p":
+            line = "".join(paragraphs.pop())
+            if cells:
+                cells[-1].append(line)
+            else:
+                yield line
+            elem.clear()
+        elif tag == W_NS + "tc":
+            cell_text = " ".join(line for line in cells.pop() if line.strip())
+            if rows:
+                rows[-1].append(cell_text)
+        elif tag == W_NS + "tr":
+            row_text = "\t".join(rows.pop()).strip()
+            if cells:
+                cells[-1].append(row_text)
+            elif row_text:
+                yield row_text
+            elem.clear()
+        elif tag == W_NS + "tbl":
+            elem.clear()
+
+def extract_text_from_docx(file_path: str) -> str:
+    """Extract text from DOCX headers, body (including tables) and footers"""
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            names = archive.namelist()
+            headers = sorted((n for n in names if re.fullmatch(r'word/header\d*\.xml', n)), key=_docx_part_order)
+            footers = sorted((n for n in names if re.fullmatch(r'word/footer\d*\.xml', n)), key=_docx_part_order)
+            
+            lines = []
+            seen_parts = set()
+            for part in headers + ["word/document.xml"] + footers:
+                with archive.open(part) as xml_file:
+                    part_lines = list(_iter_docx_part_lines(xml_file))
+                # First-page/even-page headers often repeat the default one
+                part_text = "\n".join(part_lines).strip()
+                if part != "word/document.xml" and (not part_text or part_text in seen_parts):
+                    continue
+                seen_parts.add(part_text)
+                lines.extend(part_lines)
+        return "\n".join(lines).strip()
+    except MemoryError:
+        raise
+    except Exception as e:
+        logging.error(f"DOCX extraction error: {e}")
+        return ""
+
+# =========================================================================
+# Extraction Sandbox
+# =========================================================================
+
+class ExtractionTimeout(Exception):
+    """Raised when an extraction job misses its wall-clock deadline"""
+
+class ExtractionKilled(Exception):
+    """Raised when an extraction worker dies, usually from a CPU or memory rlimit"""
+
+class ExtractionBusy(Exception):
+    """Raised when no extraction worker frees up before the job's deadline"""
+
+class ExtractionRejected(Exception):
+    """Raised when a file exceeds a static limit such as the page cap"""
+
+EXTRACTORS = {
+    "pdf": extract_text_from_pdf,
+    "pdf_pages": extract_pdf_pages,
+    "docx": extract_text_from_docx,
+}
+
+def _current_address_space() -> int:
+    """Virtual memory size of this process in bytes (0 if /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def _set_memory_limit(memory_mb: int):
+    """Give the worker memory_mb of address space on top of what it already maps.
+
+    Children (poppler, Tesseract) inherit the limit.
+    """
+    if resource is None or memory_mb <= 0:
+        return
+    limit = _current_address_space() + memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _set_cpu_limit(cpu_seconds: int):
+    """Allow cpu_seconds of CPU time for the next job on top of what the worker already used"""
+    if resource is None or cpu_seconds <= 0:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+def _extraction_worker_main(conn, cpu_seconds: int, memory_mb: int):
+    """Worker loop: receive (kind, args) jobs and reply with the extractor's result"""
+    # Own process group, so a timeout also kills pdftoppm/tesseract children
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    _set_memory_limit(memory_mb)
+    
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        
+        kind, args = job
+        _set_cpu_limit(cpu_seconds)
+        try:
+            conn.send(("ok", EXTRACTORS[kind](*args)))
+        except MemoryError:
+            conn.send(("memory", "memory limit exceeded"))
+        except PageLimitExceeded as e:
+            conn.send(("rejected", str(e)))
+        except Exception as e:
+            conn.send(("error", str(e)))
+    conn.close()
+
+class _ExtractionWorker:
+    """Handle on one supervised extraction process"""
+    
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_extraction_worker_main,
+            args=(child_conn, EXTRACTION_CPU_SECONDS, EXTRACTION_MEMORY_MB),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+    
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+    
+    def stop(self):
+        """Ask the worker to exit after its current job"""
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+    
+    def kill(self):
+        """Kill the worker and anything it spawned"""
+        if hasattr(os, "killpg"):
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        # The worker may not have called setpgrp yet, so also kill it directly
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+class ExtractionSandbox:
+    """Pool of resource-limited extraction workers, recycled after a fixed number of jobs"""
+    
+    def __init__(self, workers: int, timeout: float, max_jobs: int, on_count: Optional[Callable[[str], None]] = None):
+        # Workers start from a small forkserver that has only this module loaded,
+        # not from the (multithreaded, much larger) API process
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self._ctx = multiprocessing.get_context("forkserver")
+            self._ctx.set_forkserver_preload([__name__])
+        else:
+            self._ctx = multiprocessing.get_context("spawn")
+        self._timeout = timeout
+        self._max_jobs = max_jobs
+        # Called with the counter name on every increment, e.g. to aggregate across API processes
+        self._on_count = on_count
+        # Each slot holds an idle worker, or None until one is needed
+        self._slots = queue.Queue()
+        for _ in range(max(workers, 1)):
+            self._slots.put(None)
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "jobs": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "queue_timeouts": 0,
+            "kills": 0,
+            "memory_kills": 0,
+            "rejected": 0,
+            "recycled": 0,
+            "spawned": 0,
+        }
+    
+    def _count(self, name: str):
+        with self._metrics_lock:
+            self._metrics[name] += 1
+        if self._on_count:
+            try:
+                self._on_count(name)
+            except Exception as e:
+                logging.warning(f"Extraction metrics callback failed: {e}")
+    
+    def metrics(self) -> Dict:
+        with self._metrics_lock:
+            return dict(self._metrics)
+    
+    def run(self, kind: str, *args):
+        """Run an extractor in a worker process, blocking until done or the deadline passes.
+
+        The deadline covers both waiting for a free worker and the job itself.
+        Returns None if the extractor raised inside the worker.
+        """
+        deadline = time.monotonic() + self._timeout
+        try:
+            worker = self._slots.get(timeout=self._timeout)
+        except queue.Empty:
+            self._count("queue_timeouts")
+            raise ExtractionBusy(f"No extraction worker became free within {self._timeout} seconds")
+        if deadline - time.monotonic() <= 0:
+            self._slots.put(worker)
+            self._count("queue_timeouts")
+            raise ExtractionBusy(f"No extraction worker became free within {self._timeout} seconds")
+        try:
+            if worker is None or not worker.is_alive():
+                worker = _ExtractionWorker(self._ctx)
+                self._count("spawned")
+            
+            self._count("jobs")
+            worker.jobs += 1
+            try:
+                worker.conn.send((kind, args))
+                if not worker.conn.poll(max(deadline - time.monotonic(), 0)):
+                    logging.error(f"Extraction of {kind} timed out after {self._timeout}s; killing worker.")
+                    worker.kill()
+                    worker = None
+                    self._count("timeouts")
+                    raise ExtractionTimeout(f"Extraction timed out after {self._timeout} seconds")
+                status, payload = worker.conn.recv()
+            except (EOFError, OSError):
+                worker.kill()
+                logging.error(f"Extraction worker died (exit code {worker.process.exitcode}); likely hit a resource limit.")
+                worker = None
+                self._count("kills")
+                raise ExtractionKilled("Extraction worker was terminated")
+            
+            if status == "memory":
+                # The worker's heap is suspect after hitting RLIMIT_AS, so replace it
+                logging.error(f"Extraction of {kind} exceeded the {EXTRACTION_MEMORY_MB} MB memory limit; killing worker.")
+                worker.kill()
+                worker = None
+                self._count("memory_kills")
+                raise ExtractionKilled("Extraction exceeded its memory limit")
+            
+            if worker.jobs >= self._max_jobs:
+                worker.stop()
+                worker = None
+                self._count("recycled")
+            
+            if status == "rejected":
+                self._count("rejected")
+                raise ExtractionRejected(payload)
+            
+            if status != "ok":
+                logging.error(f"{kind.upper()} extraction error: {payload}")
+                self._count("errors")
+                return None
+            return payload
+        finally:
+            self._slots.put(worker)
+    
+    def shutdown(self):
+        """Stop all idle workers"""
+        while True:
+            try:
+                worker = self._slots.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.stop()
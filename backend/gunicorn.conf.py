@@ -0,0 +1,16 @@
+import gc
+import os
+
+# Import main.py once in the master before forking, so sklearn, the role
+# indexes and other read-only module state are shared copy-on-write.
+preload_app = True
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+
+def when_ready(server):
+    # Move preloaded objects out of the collector's generations so GC passes
+    # in the workers don't write to (and un-share) their pages.
+    gc.freeze()
@@ -1,20 +1,24 @@
 import os
 import json
+import hashlib
+import hmac
+import secrets
 import re
 from datetime import datetime
 from typing import Optional, Dict, List
 import tempfile
 import shutil
 import logging
+import sqlite3
+import time
+import threading
+import uuid
 
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from PyPDF2 import PdfReader
-from docx import Document
-import pytesseract
 from PIL import Image
-from pdf2image import convert_from_path
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
@@ -22,6 +26,12 @@ import numpy as np
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+from extraction import (
+    EXTRACTION_WORKERS, EXTRACTION_TIMEOUT_SECONDS, EXTRACTION_WORKER_MAX_JOBS,
+    ExtractionSandbox, ExtractionTimeout, ExtractionKilled, ExtractionBusy, ExtractionRejected,
+    extract_text_from_pdf, extract_text_from_docx, join_pdf_pages,
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -52,6 +62,16 @@ if GEMINI_API_KEY:
 else:
     logging.warning("GEMINI_API_KEY not found. AI analysis will use fallback responses.")
 
+# Resume revision tracking (latest revision kept per session)
+REVISION_MAX_SESSIONS = int(os.getenv("REVISION_MAX_SESSIONS", "500"))
+# Key for signing session IDs; set it to keep sessions valid across restarts.
+# The generated fallback is shared by all workers because the app is preloaded.
+SESSION_SECRET = os.getenv("SESSION_SECRET") or secrets.token_hex(32)
+
+# Cross-process cache shared by all workers (extraction, LLM responses, revisions)
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", os.path.join(tempfile.gettempdir(), "docusense-cache.sqlite3"))
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "2000"))
+
 # Pydantic models for request bodies
 class InterviewRequest(BaseModel):
     job_role: str
@@ -123,49 +143,154 @@ JOB_ROLES_DATA = {
     }
 }
 
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text from PDF using PyPDF2, fallback to OCR"""
-    try:
-        reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        
-        # If no text extracted, use OCR
-        if not text.strip():
-            logging.info("Falling back to OCR for PDF text extraction.")
+# Read-only indexes built at import time. With `gunicorn --preload` they are
+# built once in the master and shared copy-on-write by every worker.
+ROLE_SKILL_INDEX = {
+    role: [(skill, skill.lower()) for skill in data["skills"]]
+    for role, data in JOB_ROLES_DATA.items()
+}
+
+EXPERIENCE_INDICATORS = {
+    "senior": ["senior", "lead", "manager", "architect", "principal", "director"],
+    "mid": ["mid", "intermediate", "experienced", "specialist"],
+    "junior": ["junior", "entry", "associate", "intern", "trainee"]
+}
+
+# =========================================================================
+# Shared Cache
+# =========================================================================
+
+class SharedCache:
+    """JSON key/value store in a local SQLite file, shared by all worker processes.
+
+    Connections are opened lazily per process and thread, so the object can be
+    created before gunicorn forks. Cache errors are logged and treated as misses.
+    """
+    
+    def __init__(self, path: str, max_entries: int):
+        self._path = path
+        self._max_entries = max_entries
+        self._local = threading.local()
+    
+    def _connection(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self._path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_age ON cache (namespace, updated_at)")
+            local.conn = conn
+            local.pid = os.getpid()
+        return local.conn
+    
+    def get(self, namespace: str, key: str):
+        try:
+            row = self._connection().execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"Shared cache read failed: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+    
+    def set(self, namespace: str, key: str, value, max_entries: Optional[int] = None):
+        self.update(namespace, key, lambda _: value, max_entries)
+    
+    def update(self, namespace: str, key: str, fn, max_entries: Optional[int] = None):
+        """Atomically replace a value with fn(current value or None) and return the new value"""
+        max_entries = max_entries or self._max_entries
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
             try:
-                images = convert_from_path(file_path)
-                for image in images:
-                    text += pytesseract.image_to_string(image) + "\n"
-            except Exception as ocr_error:
-                logging.error(f"OCR fallback failed: {ocr_error}")
-        
-        return text.strip()
-    except Exception as e:
-        logging.error(f"PDF extraction error: {e}")
-        return ""
+                row = conn.execute(
+                    "SELECT value FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()
+                value = fn(json.loads(row[0]) if row else None)
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, json.dumps(value), time.time())
+                )
+                # Evict the oldest entries beyond the namespace limit
+                conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND updated_at < ("
+                    "SELECT updated_at FROM cache WHERE namespace = ? ORDER BY updated_at DESC LIMIT 1 OFFSET ?)",
+                    (namespace, namespace, max_entries - 1)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logging.warning(f"Shared cache write failed: {e}")
+            return None
+        return value
+
+shared_cache = SharedCache(SHARED_CACHE_PATH, max_entries=SHARED_CACHE_MAX_ENTRIES)
+
+def llm_cache_key(prompt: str) -> str:
+    """Key under which a parsed Gemini analysis is shared across worker processes"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+def count_extraction_event(name: str):
+    """Add a sandbox counter increment to the totals shared by all workers"""
+    shared_cache.update("metrics", "extraction", lambda totals: {**(totals or {}), name: (totals or {}).get(name, 0) + 1})
 
-def extract_text_from_docx(file_path: str) -> str:
-    """Extract text from DOCX file"""
+extraction_sandbox = ExtractionSandbox(
+    workers=EXTRACTION_WORKERS,
+    timeout=EXTRACTION_TIMEOUT_SECONDS,
+    max_jobs=EXTRACTION_WORKER_MAX_JOBS,
+    on_count=count_extraction_event,
+)
+
+async def run_extraction(kind: str, *args):
+    """Run an extractor in the sandbox, turning limit violations into HTTP errors"""
     try:
-        doc = Document(file_path)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text.strip()
-    except Exception as e:
-        logging.error(f"DOCX extraction error: {e}")
-        return ""
+        return await run_in_threadpool(extraction_sandbox.run, kind, *args)
+    except ExtractionTimeout:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Text extraction timed out after {EXTRACTION_TIMEOUT_SECONDS:g} seconds. The file may be too large or malformed."
+        )
+    except ExtractionBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="All text extraction workers are busy. Please try again shortly."
+        )
+    except ExtractionRejected as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ExtractionKilled:
+        raise HTTPException(
+            status_code=413,
+            detail="Text extraction exceeded its CPU or memory limit. The file may be too large or malformed."
+        )
+
+async def run_extraction_cached(kind: str, file_hash: str, *args):
+    """Run an extractor unless another worker already extracted the same file.
+
+    Returns (result, from_cache).
+    """
+    cache_key = f"{kind}:{file_hash}"
+    cached = await run_in_threadpool(shared_cache.get, "extraction", cache_key)
+    if cached is not None:
+        return cached, True
+    result = await run_extraction(kind, *args)
+    # Don't pin an empty result (e.g. OCR unavailable) to the file; let later uploads retry
+    text = join_pdf_pages(result) if kind == "pdf_pages" and result else result
+    if text and text.strip():
+        await run_in_threadpool(shared_cache.set, "extraction", cache_key, result)
+    return result, False
 
 def calculate_ats_score(resume_text: str, job_role: str, job_description: str = None) -> Dict:
     """Calculate ATS and related metrics using TF-IDF similarity"""
     
     # Get role-specific skills
-    role_data = JOB_ROLES_DATA.get(job_role, JOB_ROLES_DATA["Software Engineer"])
-    role_skills = role_data["skills"]
+    role_skills = ROLE_SKILL_INDEX.get(job_role, ROLE_SKILL_INDEX["Software Engineer"])
     
     resume_lower = resume_text.lower()
     
@@ -183,7 +308,7 @@ def calculate_ats_score(resume_text: str, job_role: str, job_description: str =
         keyword_match_pct = 65.0  # Default baseline
     
     # Calculate skill coverage
-    matched_skills = [skill for skill in role_skills if skill.lower() in resume_lower]
+    matched_skills = [skill for skill, skill_lower in role_skills if skill_lower in resume_lower]
     skill_coverage_pct = (len(matched_skills) / max(len(role_skills), 1)) * 100
     
     # Simple readability score (based on sentence length and complexity)
@@ -195,14 +320,8 @@ def calculate_ats_score(resume_text: str, job_role: str, job_description: str =
     ats_score = int((keyword_match_pct * 0.4 + skill_coverage_pct * 0.3 + readability_score * 0.3))
     
     # Determine experience level based on resume content
-    experience_indicators = {
-        "senior": ["senior", "lead", "manager", "architect", "principal", "director"],
-        "mid": ["mid", "intermediate", "experienced", "specialist"],
-        "junior": ["junior", "entry", "associate", "intern", "trainee"]
-    }
-    
     experience_level = "Mid-level"  # default
-    for level, indicators in experience_indicators.items():
+    for level, indicators in EXPERIENCE_INDICATORS.items():
         if any(indicator in resume_lower for indicator in indicators):
             experience_level = level.capitalize() + ("-level" if level != "senior" else "")
             break
@@ -227,23 +346,25 @@ def calculate_ats_score(resume_text: str, job_role: str, job_description: str =
         }
     }
 
-def analyze_with_ai(resume_text: str, role: str, job_description: str = None) -> Dict:
-    """Analyze resume using AI (Gemini or fallback)"""
-    prompt = f"""
-Analyze this resume for a {role} position and return ONLY a valid JSON object with this exact structure:
-
-{{
+RESUME_ANALYSIS_SCHEMA = """{
   "summary": "2-line professional summary based on the resume content",
   "strengths": ["specific strength from resume", "another strength", "third strength"],
   "weaknesses": ["area needing improvement", "another weakness"],
   "missing_skills": ["skill1 from job requirements", "skill2", "skill3"],
   "suggestions": [
-    {{"type": "quick", "text": "specific actionable suggestion"}},
-    {{"type": "quantify", "text": "add specific metrics suggestion"}},
-    {{"type": "structure", "text": "formatting or structure improvement"}}
+    {"type": "quick", "text": "specific actionable suggestion"},
+    {"type": "quantify", "text": "add specific metrics suggestion"},
+    {"type": "structure", "text": "formatting or structure improvement"}
   ],
-  "skill_distribution": {{"skill1": 30, "skill2": 25, "skill3": 25, "skill4": 20}}
-}}
+  "skill_distribution": {"skill1": 30, "skill2": 25, "skill3": 25, "skill4": 20}
+}"""
+
+def analyze_with_ai(resume_text: str, role: str, job_description: str = None) -> Dict:
+    """Analyze resume using AI (Gemini or fallback)"""
+    prompt = f"""
+Analyze this resume for a {role} position and return ONLY a valid JSON object with this exact structure:
+
+{RESUME_ANALYSIS_SCHEMA}
 
 Resume text:
 {resume_text[:4000]}
@@ -253,12 +374,55 @@ Job requirements (if provided):
 
 Return ONLY the JSON object, no other text or markdown formatting.
 """
+    return _run_resume_prompt(prompt, role)
+
+def reanalyze_with_ai(previous_analysis: Dict, changed_sections: List[Dict], removed_sections: List[str],
+                      role: str, job_description: str = None) -> Dict:
+    """Update a previous resume analysis by sending only the revised sections to the AI"""
+    changed_text = "\n\n".join(f"### {section['title']}\n{section['text']}" for section in changed_sections)
+    prompt = f"""
+You previously analyzed a resume for a {role} position. The candidate has revised it.
+
+Previous analysis:
+{json.dumps(previous_analysis)[:3000]}
+
+Changed or new resume sections:
+{changed_text[:4000] if changed_text else "None"}
+
+Removed sections: {", ".join(removed_sections) if removed_sections else "None"}
+
+All other sections are unchanged from the previously analyzed version.
+
+Job requirements (if provided):
+{job_description[:1000] if job_description else f"General {role} role requirements"}
+
+Update the previous analysis to reflect these changes and return ONLY a valid JSON object with this exact structure:
+
+{RESUME_ANALYSIS_SCHEMA}
+
+Return ONLY the JSON object, no other text or markdown formatting.
+"""
+    return _run_resume_prompt(prompt, role)
+
+def _run_resume_prompt(prompt: str, role: str) -> Dict:
+    """Send a resume analysis prompt to Gemini (or build the fallback) and parse the JSON reply.
+
+    Error fallbacks are marked with "_fallback" so they are never reused as a real analysis.
+    Only successfully parsed Gemini replies are cached.
+    """
+    cache_key = llm_cache_key(prompt)
+    if GEMINI_API_KEY:
+        cached = shared_cache.get("llm", cache_key)
+        if cached is not None:
+            return cached
     
+    from_model = False
     try:
         if GEMINI_API_KEY:
             model = genai.GenerativeModel("gemini-2.5-flash")
             response = model.generate_content(prompt)
             ai_text = response.text.strip()
+            from_model = True
             
             # Clean up potential markdown formatting
             ai_text = re.sub(r'^```json\s*', '', ai_text)
@@ -293,16 +457,17 @@ Return ONLY the JSON object, no other text or markdown formatting.
             "weaknesses": ["Advanced analysis unavailable"],
             "missing_skills": ["API configuration needed"],
             "suggestions": [{"type": "quick", "text": "Verify API configuration for detailed analysis"}],
-            "skill_distribution": {"frontend": 25, "backend": 25, "tools": 25, "soft skills": 25}
+            "skill_distribution": {"frontend": 25, "backend": 25, "tools": 25, "soft skills": 25},
+            "_fallback": True
         })
     
     try:
         # Extract JSON from response
         json_match = re.search(r'\{.*\}', ai_text, re.DOTALL)
         if json_match:
-            return json.loads(json_match.group())
+            result = json.loads(json_match.group())
         else:
-            return json.loads(ai_text)
+            result = json.loads(ai_text)
     except json.JSONDecodeError as e:
         logging.error(f"Failed to parse AI response as JSON: {e}")
         return {
@@ -311,8 +476,13 @@ Return ONLY the JSON object, no other text or markdown formatting.
             "weaknesses": ["Detailed analysis unavailable"],
             "missing_skills": ["Check API configuration"],
             "suggestions": [{"type": "quick", "text": "Verify system configuration"}],
-            "skill_distribution": {"technical": 40, "experience": 30, "soft skills": 30}
+            "skill_distribution": {"technical": 40, "experience": 30, "soft skills": 30},
+            "_fallback": True
         }
+    
+    if from_model:
+        shared_cache.set("llm", cache_key, result)
+    return result
 
 def analyze_general_document(text: str) -> Dict:
     """Analyze a general document using AI with type recognition"""
@@ -336,11 +506,19 @@ Analyze the content type, extract key insights, determine sentiment, and provide
 Return ONLY the JSON object with no additional text or formatting.
 """
     
+    cache_key = llm_cache_key(prompt)
+    if GEMINI_API_KEY:
+        cached = shared_cache.get("llm", cache_key)
+        if cached is not None:
+            return cached
+    
+    from_model = False
     try:
         if GEMINI_API_KEY:
             model = genai.GenerativeModel("gemini-2.5-flash")
             response = model.generate_content(prompt)
             ai_text = response.text.strip()
+            from_model = True
             
             # Clean up potential markdown formatting
             ai_text = re.sub(r'^```json\s*', '', ai_text)
@@ -384,9 +562,9 @@ Return ONLY the JSON object with no additional text or formatting.
     try:
         json_match = re.search(r'\{.*\}', ai_text, re.DOTALL)
         if json_match:
-            return json.loads(json_match.group())
+            result = json.loads(json_match.group())
         else:
-            return json.loads(ai_text)
+            result = json.loads(ai_text)
     except json.JSONDecodeError:
         logging.error("Failed to parse AI response as JSON for general document.")
         return {
@@ -398,6 +576,11 @@ Return ONLY the JSON object with no additional text or formatting.
             "word_count": len(text.split()),
             "improvement_suggestions": ["Check system configuration"]
         }
+    
+    # Only share replies that parsed, so one malformed response isn't served to everyone
+    if from_model:
+        shared_cache.set("llm", cache_key, result)
+    return result
 
 def generate_cover_letter_with_ai(resume_summary: str, job_description: str, role: str) -> str:
     """Generate a cover letter using AI."""
@@ -522,6 +705,100 @@ def calculate_salary_estimate(role: str, experience_level: str, skills: List[str
         ]
     }
 
+# =========================================================================
+# Resume Revisions
+# =========================================================================
+
+RESUME_SECTION_HEADINGS = {
+    "summary", "professional summary", "profile", "objective", "about me",
+    "experience", "work experience", "professional experience", "employment history", "work history",
+    "education", "skills", "technical skills", "core competencies", "projects", "personal projects",
+    "certifications", "certificates", "awards", "achievements", "publications", "languages",
+    "interests", "volunteer experience", "leadership", "activities", "references",
+}
+
+SCORE_DELTA_METRICS = ["ats_score", "keyword_match_pct", "skill_coverage_pct", "readability_score", "estimated_improvement_points"]
+
+def content_hash(text: str) -> str:
+    """Hash text with whitespace normalized, so reflowed lines don't count as changes"""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+def split_resume_sections(text: str) -> List[Dict]:
+    """Split resume text into sections at common heading lines"""
+    sections = [{"title": "Header", "lines": []}]
+    for line in text.splitlines():
+        heading = line.strip().rstrip(":").strip().lower()
+        if heading in RESUME_SECTION_HEADINGS:
+            sections.append({"title": line.strip().rstrip(":").strip().title(), "lines": []})
+        else:
+            sections[-1]["lines"].append(line)
+    
+    result = []
+    title_counts = {}
+    for section in sections:
+        section_text = "\n".join(section["lines"]).strip()
+        if not section_text:
+            continue
+        # Keep titles unique so sections can be matched across revisions
+        count = title_counts.get(section["title"], 0) + 1
+        title_counts[section["title"]] = count
+        title = section["title"] if count == 1 else f"{section['title']} ({count})"
+        result.append({"title": title, "text": section_text, "hash": content_hash(section_text)})
+    return result
+
+def diff_sections(previous_sections: Dict[str, str], sections: List[Dict]) -> Dict:
+    """Compare section hashes against the previous revision"""
+    changed = [section for section in sections if previous_sections.get(section["title"]) != section["hash"]]
+    current_titles = {section["title"] for section in sections}
+    removed = [title for title in previous_sections if title not in current_titles]
+    return {"changed": changed, "removed": removed}
+
+def calculate_score_delta(previous_metrics: Dict, metrics: Dict) -> Dict:
+    """Score changes between two revisions"""
+    delta = {
+        name: round(metrics[name] - previous_metrics[name], 1)
+        for name in SCORE_DELTA_METRICS
+    }
+    previous_keywords = set(previous_metrics["keywords_matched"])
+    delta["keywords_added"] = [skill for skill in metrics["keywords_matched"] if skill not in previous_keywords]
+    delta["keywords_removed"] = [skill for skill in previous_metrics["keywords_matched"] if skill not in set(metrics["keywords_matched"])]
+    return delta
+
+def _session_signature(token: str) -> str:
+    return hmac.new(SESSION_SECRET.encode(), token.encode(), hashlib.sha256).hexdigest()[:32]
+
+def issue_session_id() -> str:
+    """New session ID in the form <uuid4 hex>.<signature>"""
+    token = uuid.uuid4().hex
+    return f"{token}.{_session_signature(token)}"
+
+def is_valid_session_id(session_id: Optional[str]) -> bool:
+    """True only for session IDs this server issued"""
+    token, _, signature = (session_id or "").partition(".")
+    if not re.fullmatch(r"[0-9a-f]{32}", token) or len(signature) != 32:
+        return False
+    return hmac.compare_digest(signature, _session_signature(token))
+
+class ResumeRevisionStore:
+    """Latest analyzed revision per session, kept in the shared cache so any worker can continue a session"""
+    
+    def __init__(self, cache: SharedCache, max_sessions: int):
+        self._cache = cache
+        self._max_sessions = max_sessions
+    
+    def latest(self, session_id: str) -> Optional[Dict]:
+        return self._cache.get("revision", session_id)
+    
+    def record(self, session_id: str, revision: Dict) -> int:
+        """Store a revision as the session's latest and return its revision number"""
+        def next_revision(previous):
+            revision["revision"] = previous["revision"] + 1 if previous else 1
+            return revision
+        self._cache.update("revision", session_id, next_revision, max_entries=self._max_sessions)
+        return revision.get("revision", 1)
+
+resume_revisions = ResumeRevisionStore(shared_cache, max_sessions=REVISION_MAX_SESSIONS)
+
 # =========================================================================
 # API Endpoints
 # =========================================================================
@@ -534,13 +811,38 @@ async def root():
 async def health():
     return {"status": "healthy", "timestamp": datetime.utcnow().isoformat() + "Z"}
 
+@app.get("/metrics")
+async def metrics():
+    """Counters for the extraction sandbox (jobs, timeouts, kills, recycled workers).
+
+    "extraction" holds the totals across all workers; "worker" is the process that answered.
+    """
+    worker_counts = extraction_sandbox.metrics()
+    totals = await run_in_threadpool(shared_cache.get, "metrics", "extraction") or {}
+    return {
+        "status": "ok",
+        "extraction": {name: totals.get(name, 0) for name in worker_counts},
+        "worker": {"pid": os.getpid(), "extraction": worker_counts},
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
+
+@app.on_event("shutdown")
+async def shutdown_extraction_sandbox():
+    extraction_sandbox.shutdown()
+
 @app.post("/api/analyze-resume")
 async def analyze_resume(
     file: UploadFile = File(...),
     job_role: str = Form(...),
-    job_description: Optional[str] = Form(None)
+    job_description: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None)
 ):
-    """Analyze an uploaded resume for ATS optimization and AI insights."""
+    """Analyze an uploaded resume for ATS optimization and AI insights.
+
+    Uploads sharing a session_id are treated as revisions of one resume: unchanged
+    pages and sections are reused and the response includes the score delta.
+    Only session IDs issued by this server are accepted; any other value starts a new session.
+    """
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
     
@@ -557,24 +859,82 @@ async def analyze_resume(
         temp_file.write(contents)
     
     try:
-        # Extract text based on file type
-        if file_ext == '.pdf':
-            text = extract_text_from_pdf(temp_path)
+        if not is_valid_session_id(session_id):
+            session_id = issue_session_id()
+        previous = await run_in_threadpool(resume_revisions.latest, session_id)
+        file_hash = hashlib.sha256(contents).hexdigest()
+        pages = {}
+        reused_pages = 0
+        
+        # Extract text based on file type, reusing the previous revision where possible
+        if previous and previous["file_hash"] == file_hash:
+            text = previous["text"]
+            pages = previous["pages"]
+            reused_pages = len(pages)
+        elif file_ext == '.pdf':
+            page_results, from_cache = await run_extraction_cached(
+                "pdf_pages", file_hash, temp_path, previous["pages"] if previous else None
+            )
+            page_results = page_results or []
+            text = join_pdf_pages(page_results)
+            pages = {page["hash"]: {"text": page["text"], "ocr": page["ocr"]} for page in page_results}
+            reused_pages = len(page_results) if from_cache else sum(1 for page in page_results if page["reused"])
         else:
-            text = extract_text_from_docx(temp_path)
+            text, _ = await run_extraction_cached("docx", file_hash, temp_path)
+            text = text or ""
         
         if not text.strip():
             raise HTTPException(status_code=400, detail="Could not extract text from the file. Please ensure the file contains readable text.")
         
-        # Perform analysis
-        metrics = calculate_ats_score(text, job_role, job_description)
-        ai_analysis = analyze_with_ai(text, job_role, job_description)
+        sections = split_resume_sections(text)
+        text_hash = content_hash(text)
+        same_target = bool(previous) and previous["job_role"] == job_role and previous["job_description"] == job_description
+        section_diff = diff_sections(previous["sections"] if previous else {}, sections)
+        
+        # Perform analysis, recomputing only what the revision affects
+        if same_target and previous["text_hash"] == text_hash:
+            metrics = previous["metrics"]
+        else:
+            metrics = calculate_ats_score(text, job_role, job_description)
+        
+        # A previous error fallback is not a real analysis, so start over from the full text
+        can_reuse_analysis = same_target and previous["ai_analysis"] is not None
+        if can_reuse_analysis and not section_diff["changed"] and not section_diff["removed"]:
+            ai_analysis = previous["ai_analysis"]
+        elif can_reuse_analysis:
+            ai_analysis = await run_in_threadpool(reanalyze_with_ai, previous["ai_analysis"], section_diff["changed"],
+                                                  section_diff["removed"], job_role, job_description)
+        else:
+            ai_analysis = await run_in_threadpool(analyze_with_ai, text, job_role, job_description)
+        ai_fallback = ai_analysis.pop("_fallback", False)
+        
+        revision = await run_in_threadpool(resume_revisions.record, session_id, {
+            "file_hash": file_hash,
+            "text": text,
+            "text_hash": text_hash,
+            "pages": pages,
+            "sections": {section["title"]: section["hash"] for section in sections},
+            "job_role": job_role,
+            "job_description": job_description,
+            "metrics": metrics,
+            "ai_analysis": None if ai_fallback else ai_analysis,
+        })
         
         return {
             "status": "ok",
             "metrics": metrics,
             **ai_analysis,
             "keywords_matched": metrics["keywords_matched"],
+            "revision": {
+                "session_id": session_id,
+                "revision": revision,
+                "changed_sections": [section["title"] for section in section_diff["changed"]] if previous else [],
+                "removed_sections": section_diff["removed"],
+                "reused_pages": reused_pages,
+                # Scores against a different role or job description aren't comparable
+                "target_changed": bool(previous) and not same_target,
+                "score_delta": calculate_score_delta(previous["metrics"], metrics) if same_target else None
+            },
             "timestamp": datetime.utcnow().isoformat() + "Z"
         }
     
@@ -607,12 +967,15 @@ async def analyze_document(file: UploadFile = File(...)):
     
     try:
         text = ""
+        file_hash = hashlib.sha256(contents).hexdigest()
         
         # Extract text based on file type
         if file_ext == '.pdf':
-            text = extract_text_from_pdf(temp_path)
+            text, _ = await run_extraction_cached("pdf", file_hash, temp_path)
+            text = text or ""
         elif file_ext in ['.docx', '.doc']:
-            text = extract_text_from_docx(temp_path)
+            text, _ = await run_extraction_cached("docx", file_hash, temp_path)
+            text = text or ""
         elif file_ext in ['.txt', '.md']:
             try:
                 text = contents.decode('utf-8', errors='ignore')
@@ -629,7 +992,7 @@ async def analyze_document(file: UploadFile = File(...)):
             raise HTTPException(status_code=400, detail="Could not extract readable text from the file.")
         
         # Perform AI analysis
-        ai_analysis = analyze_general_document(text)
+        ai_analysis = await run_in_threadpool(analyze_general_document, text)
         
         return {
             "status": "ok",
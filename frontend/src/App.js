@@ -69,6 +69,7 @@ function App() {
   const [resumeError, setResumeError] = useState(null);
   const [resumeHistory, setResumeHistory] = useState([]);
   const [resumeDragActive, setResumeDragActive] = useState(false);
+  const [resumeSessionId, setResumeSessionId] = useState(null);
 
   // Document Analysis State
   const [documentFile, setDocumentFile] = useState(null);
@@ -125,6 +126,10 @@ function App() {
     if (resumeJobDescription && resumeJobDescription.trim()) {
       formData.append("job_description", resumeJobDescription);
     }
+    // Re-uploads in the same session are analyzed as revisions of the previous resume
+    if (resumeSessionId) {
+      formData.append("session_id", resumeSessionId);
+    }
 
     try {
       const res = await fetch(`${API_URL}/api/analyze-resume`, {
@@ -140,6 +145,9 @@ function App() {
 
       if (data.status === "ok") {
         setResumeResult(data);
+        if (data.revision && data.revision.session_id) {
+          setResumeSessionId(data.revision.session_id);
+        }
         const newHistory = [...resumeHistory, { 
           ...data, 
           filename: resumeFile.name, 
@@ -508,6 +516,43 @@ function App() {
                 {/* Enhanced Resume Results */}
                 {resumeResult && (
                   <div className="space-y-8">
+                    {/* Changes since the previous revision */}
+                    {resumeResult.revision && resumeResult.revision.score_delta && (
+                      <div className="bg-white rounded-2xl shadow-xl border border-gray-100 p-6">
+                        <div className="flex items-center space-x-3 mb-4">
+                          <TrendingUp className="w-6 h-6 text-indigo-600" />
+                          <h3 className="text-xl font-bold text-gray-900">
+                            Changes Since Revision {resumeResult.revision.revision - 1}
+                          </h3>
+                        </div>
+                        <div className="grid grid-cols-2 gap-4 sm:grid-cols-4">
+                          {[
+                            { label: "ATS Score", value: resumeResult.revision.score_delta.ats_score, unit: "" },
+                            { label: "Skill Match", value: resumeResult.revision.score_delta.skill_coverage_pct, unit: "%" },
+                            { label: "Keywords", value: resumeResult.revision.score_delta.keyword_match_pct, unit: "%" },
+                            { label: "Readability", value: resumeResult.revision.score_delta.readability_score, unit: "%" }
+                          ].map((delta) => (
+                            <div key={delta.label} className="text-center">
+                              <div className={`text-2xl font-bold ${delta.value > 0 ? "text-green-600" : delta.value < 0 ? "text-red-600" : "text-gray-500"}`}>
+                                {delta.value > 0 ? "+" : ""}{delta.value}{delta.unit}
+                              </div>
+                              <div className="text-sm text-gray-600">{delta.label}</div>
+                            </div>
+                          ))}
+                        </div>
+                        {(resumeResult.revision.score_delta.keywords_added.length > 0 || resumeResult.revision.score_delta.keywords_removed.length > 0) && (
+                          <div className="flex flex-wrap gap-2 mt-4">
+                            {resumeResult.revision.score_delta.keywords_added.map((keyword) => (
+                              <span key={`added-${keyword}`} className="px-3 py-1 bg-green-100 text-green-800 rounded-full text-sm font-medium">+ {keyword}</span>
+                            ))}
+                            {resumeResult.revision.score_delta.keywords_removed.map((keyword) => (
+                              <span key={`removed-${keyword}`} className="px-3 py-1 bg-red-100 text-red-800 rounded-full text-sm font-medium">− {keyword}</span>
+                            ))}
+                          </div>
+                        )}
+                      </div>
+                    )}
+
                     {/* Performance Metrics Dashboard */}
                     <div className="grid grid-cols-1 gap-6 sm:grid-cols-2 lg:grid-cols-4">
                       {[{